@@ -1,40 +1,236 @@
 #!/usr/bin/env python3
 
 import argparse
-import base64
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
 from datetime import datetime
+import functools
+import hashlib
+import io
+import itertools
 import json
+import mmap
 import os
+import re
+import shlex
 import shutil
 import subprocess
 import sys
 import tarfile
+import tempfile
+import threading
+import time
+
+try:
+    # SIMD accelerated drop-in replacement for base64
+    import pybase64 as base64
+except ImportError:
+    import base64
+
+try:
+    from kubernetes import client as k8s_client, config as k8s_config
+except ImportError:
+    # without the kubernetes client every call goes through kubectl
+    k8s_client = None
+
+try:
+    import zstandard
+except ImportError:
+    # only needed for zstd compressed archives
+    zstandard = None
+
+# pg_dump/pg_restore work directory inside the postgres container
+DUMP_DIR = "/tmp/backup.dump"
+
+# copy buffer for tar members and block size of streamed tars, tarfile
+# defaults to 16 KiB and 10 KiB
+COPY_BUFSIZE = 2 * 1024 * 1024
+
+# number of secrets recreated concurrently during restore
+SECRET_WORKERS = 16
+
+# operator and database pod names are cached between runs for this many seconds
+CACHE_TTL = 300
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "local-awx")
 
 class Deployment:
-    def __init__(self, namespace):
+    def __init__(self, namespace, jobs=None, local_db=False):
         self.namespace = namespace
-        self.operator_name = self.run_k8s("get", "awx", "-o", "jsonpath={.items[0].metadata.name}")
-        self.db_pod = self.run_k8s("get", "pod", "--selector=app.kubernetes.io/component=database", "-o", "jsonpath={.items[0].metadata.name}")
-        self.db_configuration = json.loads(self.run_k8s("get", "secret", f"{self.operator_name}-postgres-configuration", "-o", "jsonpath={.data}"))
+        # kubectl's path and the namespace arguments are resolved once and
+        # shared by every command rather than looked up on each call
+        self.kubectl = [shutil.which("kubectl") or "kubectl", "-n", namespace]
+        self.api = None
+        self.core = None
+        if k8s_client is not None:
+            # a single client reuses one connection to the apiserver
+            k8s_config.load_kube_config()
+            self.api = k8s_client.ApiClient()
+            self.core = k8s_client.CoreV1Api(self.api)
+
+        # the same namespace can exist in several clusters, so the cache is per
+        # context and apiserver too
+        key = hashlib.sha256("\n".join([*self.get_cluster(), namespace]).encode()).hexdigest()[:16]
+        self.cache_file = os.path.join(CACHE_DIR, f"{namespace}-{key}.json")
+        cache = self.load_cache()
+        if cache:
+            self.operator_name = cache["operator_name"]
+            self.db_pod = cache["db_pod"]
+        else:
+            self.operator_name = self.get_operator_name()
+            self.db_pod = self.get_db_pod()
+            self.save_cache()
+        self.db_configuration = self.get_secret_data(f"{self.operator_name}-postgres-configuration")
         self.decode(self.db_configuration, *self.db_configuration.keys())
 
+        # with a local port the postgres client tools run on this machine
+        self.db_port = self.start_port_forward() if local_db else None
+        # by default size the jobs to the CPUs where pg_dump/pg_restore run
+        if jobs is None and local_db:
+            jobs = os.cpu_count() or 1
+        elif jobs is None:
+            jobs = self.get_db_cpus()
+        self.jobs = jobs
+
+    def get_db_cpus(self):
+        try:
+            return max(1, int(self.exec_k8s(self.db_pod, "postgres", "nproc")))
+        except ValueError:
+            return 1
+
+    def start_port_forward(self):
+        proc = subprocess.Popen(
+            [*self.kubectl, "port-forward", f"pod/{self.db_pod}", ":5432"],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        atexit.register(proc.terminate)
+
+        # Forwarding from 127.0.0.1:<port> -> 5432
+        match = re.search(r"127\.0\.0\.1:(\d+)", proc.stdout.readline())
+        if match is None:
+            self.fail(proc.wait() or 1)
+        # kubectl logs every connection, keep reading so it never blocks on a full pipe
+        threading.Thread(target=proc.stdout.read, daemon=True).start()
+        return int(match.group(1))
+
+    def get_cluster(self):
+        if self.core is None:
+            # only reads the kubeconfig, it doesn't talk to the apiserver
+            config = json.loads(self.run_k8s("config", "view", "--minify", "-o", "json", decode=False))
+            return config["current-context"], config["clusters"][0]["cluster"]["server"]
+        _, context = k8s_config.list_kube_config_contexts()
+        return context["name"], self.api.configuration.host
+
+    def load_cache(self):
+        try:
+            if time.time() - os.path.getmtime(self.cache_file) < CACHE_TTL:
+                with open(self.cache_file) as cache_file:
+                    cache = json.load(cache_file)
+                # anything but both names is treated as a miss
+                if isinstance(cache, dict) and {"operator_name", "db_pod"} <= cache.keys():
+                    return cache
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def save_cache(self):
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(self.cache_file, "w") as cache_file:
+                json.dump({"operator_name": self.operator_name, "db_pod": self.db_pod}, cache_file)
+        except OSError:
+            pass
+
+    def fail(self, returncode):
+        # the cached names may be what caused the failure, look them up again next time
+        try:
+            os.remove(self.cache_file)
+        except OSError:
+            pass
+        sys.exit(returncode)
+
+    def call_api(self, method, *args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except k8s_client.ApiException as e:
+            print(e, file=sys.stderr)
+            self.fail(1)
+
+    def get_operator_name(self):
+        if self.core is None:
+            return self.run_k8s("get", "awx", "-o", "jsonpath={.items[0].metadata.name}")
+        custom = k8s_client.CustomObjectsApi(self.api)
+        awxs = self.call_api(custom.list_namespaced_custom_object, "awx.ansible.com", "v1beta1", self.namespace, "awxs")
+        return awxs["items"][0]["metadata"]["name"]
+
+    def get_db_pod(self):
+        selector = "app.kubernetes.io/component=database"
+        if self.core is None:
+            return self.run_k8s("get", "pod", f"--selector={selector}", "-o", "jsonpath={.items[0].metadata.name}")
+        pods = self.call_api(self.core.list_namespaced_pod, self.namespace, label_selector=selector)
+        return pods.items[0].metadata.name
+
+    def get_secret_data(self, name):
+        # only the data is needed, the rest of the secret isn't fetched or parsed
+        if self.core is None:
+            return json.loads(self.run_k8s("get", "secret", name, "-o", "jsonpath={.data}", decode=False))
+        return self.call_api(self.core.read_namespaced_secret, name, self.namespace).data
+
+    def list_secrets(self):
+        if self.core is None:
+            return json.loads(self.run_k8s("get", "secrets", "-o", "json", decode=False))["items"]
+        secrets = self.call_api(self.core.list_namespaced_secret, self.namespace)
+        return [self.api.sanitize_for_serialization(secret) for secret in secrets.items]
+
+    def replace_secret_data(self, name, data):
+        # a json patch swaps the whole data map without fetching the secret
+        # first, "add" replaces the member when it is already there
+        patch = [{"op": "add", "path": "/data", "value": data}]
+        if self.core is None:
+            self.run_k8s("patch", "secret", name, "--type=json", "-p", json.dumps(patch))
+        else:
+            self.call_api(self.core.patch_namespaced_secret, name, self.namespace, patch)
+
     def run_k8s(self, *cmd, stdin=None, stdout=None, stderr=None, decode=True):
-        command = [
-            "kubectl",
-            "-n",
-            self.namespace,
-            *cmd
-        ]
-        result = subprocess.run(command, capture_output=(stdout is None), input=stdin, stdout=stdout, stderr=stderr)
+        if hasattr(stdin, "read"):
+            # feed file objects through in chunks rather than reading them into memory
+            with self.open_k8s(*cmd, stdin=subprocess.PIPE, stdout=stdout, stderr=stderr) as proc:
+                try:
+                    shutil.copyfileobj(stdin, proc.stdin, COPY_BUFSIZE)
+                except BrokenPipeError:
+                    # the command exited early, open_k8s reports its return code
+                    pass
+            return None
+
+        command = [*self.kubectl, *cmd]
+        # redirected output goes straight to its file descriptor, only what is
+        # returned or reported on failure is piped through python
+        result = subprocess.run(
+            command,
+            input=stdin,
+            stdout=subprocess.PIPE if stdout is None else stdout.fileno(),
+            stderr=subprocess.PIPE if stderr is None else stderr.fileno(),
+        )
         if result.returncode != 0:
-            print(result.stderr, file=sys.stderr)
-            sys.exit(result.returncode)
+            if result.stderr:
+                print(result.stderr.decode(errors="replace"), file=sys.stderr)
+            self.fail(result.returncode)
         if stdout is None:
             if decode:
                 return result.stdout.decode()
             return result.stdout
 
-    def exec_k8s(self, pod, container, *cmd, stdin=None, stdout=None, stderr=None, decode=True):
+    @contextlib.contextmanager
+    def open_k8s(self, *cmd, stdin=None, stdout=None, stderr=None):
+        command = [*self.kubectl, *cmd]
+        with subprocess.Popen(command, stdin=stdin, stdout=stdout, stderr=stderr) as proc:
+            yield proc
+        if proc.returncode != 0:
+            self.fail(proc.returncode)
+
+    @staticmethod
+    def exec_args(pod, container, *cmd, stdin=None):
         exec_cmd = ["exec"]
         if stdin:
             exec_cmd.append("-i")
@@ -44,6 +240,14 @@ class Deployment:
             "--",
             *cmd,
         ])
+        return exec_cmd
+
+    def open_exec(self, pod, container, *cmd, stdin=None, stdout=None):
+        exec_cmd = self.exec_args(pod, container, *cmd, stdin=stdin)
+        return self.open_k8s(*exec_cmd, stdin=stdin, stdout=stdout)
+
+    def exec_k8s(self, pod, container, *cmd, stdin=None, stdout=None, stderr=None, decode=True):
+        exec_cmd = self.exec_args(pod, container, *cmd, stdin=stdin)
         return self.run_k8s(*exec_cmd, stdin=stdin, stdout=stdout, stderr=stderr, decode=decode)
 
     def exec_db(self, cmd, *args, stdin=None, stdout=None, stderr=None, decode=True):
@@ -66,82 +270,261 @@ class Deployment:
         for key in keys:
             data[key] = base64.b64decode(data[key]).decode("utf-8")
 
-    def backup(self, name):
-        os.mkdir(name)
-        with open(os.path.join(name, "backup.dump"), "wb") as dumpfile:
-            self.exec_db(
-                "pg_dump",
-                "-Fc",
-                self.db_configuration["database"],
-                decode=False,
-                stdout=dumpfile,
-            )
-
-        output = self.run_k8s("get", "secrets", "-o", "jsonpath={.items[*].metadata.name}")
-        for secret_name in output.split():
-            if secret_name.endswith("postgres-configuration"):
-                continue
-
-            with open(os.path.join(name, f"{secret_name}_secret.json"), "w") as secret_file:
-                secret = self.run_k8s("get", "secret", secret_name, "-o", "json", stdout=secret_file)
-
-        with tarfile.open(f"{name}.tar", "w") as tar:
-            tar.add(name)
-
-        shutil.rmtree(name)
-
-    def recreate_db(self, backup):
-        # drop the existing database
-        self.exec_db(
-            "dropdb",
-            "--force",  # force will disconnect existing clients
-            "--if-exists",
-            self.db_configuration['database'],
-        )
+    @staticmethod
+    @contextlib.contextmanager
+    def open_archive(name, mode):
+        compressed = name.endswith(".zst")
+        if compressed and zstandard is None:
+            sys.exit(f"The zstandard package is required for {name}")
 
-        # recreate the empty database
-        self.exec_db(
-            "createdb",
-            f"--owner={self.db_configuration['username']}",
-            self.db_configuration['database'],
-        )
+        # a backup is written next to its final name and only moved over it once
+        # complete, so a failed run never clobbers an existing archive
+        path = f"{name}.partial" if mode == "w" else name
+        try:
+            with contextlib.ExitStack() as stack:
+                archive = stack.enter_context(open(path, f"{mode}b"))
+                if mode == "r":
+                    # read straight out of the page cache and let the kernel read
+                    # ahead and drop pages behind the cursor
+                    archive = stack.enter_context(mmap.mmap(archive.fileno(), 0, access=mmap.ACCESS_READ))
+                    if hasattr(mmap, "MADV_SEQUENTIAL"):
+                        archive.madvise(mmap.MADV_SEQUENTIAL)
+
+                if compressed and mode == "w":
+                    # threads=-1 compresses on every CPU
+                    archive = stack.enter_context(zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(archive))
+                elif compressed:
+                    archive = stack.enter_context(zstandard.ZstdDecompressor().stream_reader(archive))
 
-        # load the backup file
-        self.exec_db(
-            "pg_restore",
-            "-d", self.db_configuration['database'],
-            "-x", "-1",
-            "--verbose",
-            stdin=backup,
+                # archives are only ever read or written front to back, so they are
+                # always opened as a stream, which compressed files need anyway
+                yield stack.enter_context(
+                    tarfile.open(fileobj=archive, mode=f"{mode}|", bufsize=COPY_BUFSIZE, copybufsize=COPY_BUFSIZE)
+                )
+        except BaseException:
+            if mode == "w":
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+            raise
+        if mode == "w":
+            os.replace(path, name)
+
+    def run_local_db(self, *commands):
+        env = {
+            **os.environ,
+            "PGHOST": "127.0.0.1",
+            "PGPORT": str(self.db_port),
+            "PGUSER": self.db_configuration["username"],
+            "PGPASSWORD": self.db_configuration["password"],
+        }
+        for command in commands:
+            result = subprocess.run(command, env=env)
+            if result.returncode != 0:
+                self.fail(result.returncode)
+
+    def dump_db(self, tar, arcroot, *dump_args):
+        self.exec_k8s(self.db_pod, "postgres", "rm", "-rf", DUMP_DIR)
+        self.exec_db("pg_dump", *dump_args, "-f", DUMP_DIR, self.db_configuration["database"])
+
+        # stream the dump directory out of the pod straight into the archive
+        with self.open_exec(
+            self.db_pod,
+            "postgres",
+            "tar", "c", "-C", os.path.dirname(DUMP_DIR), os.path.basename(DUMP_DIR),
+            stdout=subprocess.PIPE,
+        ) as proc:
+            with tarfile.open(fileobj=proc.stdout, mode="r|", bufsize=COPY_BUFSIZE, copybufsize=COPY_BUFSIZE) as dump:
+                for member in dump:
+                    member.name = f"{arcroot}/{member.name}"
+                    # tarfile writes its own extended headers if a member still needs them
+                    member.pax_headers = {}
+                    tar.addfile(member, dump.extractfile(member))
+        self.exec_k8s(self.db_pod, "postgres", "rm", "-rf", DUMP_DIR)
+
+    def dump_db_local(self, tar, arcroot, *dump_args):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, os.path.basename(DUMP_DIR))
+            self.run_local_db(["pg_dump", *dump_args, "-f", path, self.db_configuration["database"]])
+            arcname = f"{arcroot}/{os.path.basename(DUMP_DIR)}"
+            self.add_path(tar, path, arcname)
+            # pg_dump's directory format is flat
+            for entry in sorted(os.scandir(path), key=lambda entry: entry.name):
+                self.add_path(tar, entry.path, f"{arcname}/{entry.name}")
+
+    def backup(self, name, zstd=False):
+        name_ext = f"{name}.tar.zst" if zstd else f"{name}.tar"
+        # members are stored relative like tar.add does, even for absolute names
+        arcroot = name.lstrip("/")
+        with self.open_archive(name_ext, "w") as tar:
+            # directory format is the only one pg_dump can write with parallel jobs,
+            # each job also compresses the tables it dumps so compression is spread
+            # across the jobs rather than done by a single process
+            dump_args = ["-Fd", "-j", str(self.jobs)]
+            if self.db_port is None:
+                # kubectl exec is the slowest link, so the tables stay compressed
+                # in the pod even when the archive is compressed again with zstd
+                self.dump_db(tar, arcroot, *dump_args)
+            else:
+                # a local dump is only compressed once, by zstd when it's used
+                self.dump_db_local(tar, arcroot, *dump_args, *(["-Z0"] if zstd else []))
+
+            for secret in self.list_secrets():
+                secret_name = secret["metadata"]["name"]
+                if secret_name.endswith("postgres-configuration"):
+                    continue
+
+                self.add_bytes(tar, f"{arcroot}/{secret_name}_secret.json", json.dumps(secret).encode())
+
+    @staticmethod
+    def add_bytes(tar, name, content):
+        info = tarfile.TarInfo(name)
+        info.size = len(content)
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(content))
+
+    @staticmethod
+    def add_path(tar, path, name):
+        info = tar.gettarinfo(path, name)
+        # a fractional mtime is the one thing that makes tarfile add a pax
+        # extended header to an otherwise plain ustar member
+        info.mtime = int(info.mtime)
+        if info.isreg():
+            with open(path, "rb") as content:
+                tar.addfile(info, content)
+        else:
+            tar.addfile(info)
+
+    def recreate_db(self, *restore_args, stdin=None):
+        commands = [
+            # drop the existing database
+            [
+                "dropdb",
+                "--force",  # force will disconnect existing clients
+                "--if-exists",
+                self.db_configuration['database'],
+            ],
+            # recreate the empty database
+            [
+                "createdb",
+                f"--owner={self.db_configuration['username']}",
+                self.db_configuration['database'],
+            ],
+            # load the backup file
+            [
+                "pg_restore",
+                "-d", self.db_configuration['database'],
+                "-x",
+                "--exit-on-error",
+                "--verbose",
+                *restore_args,
+            ],
+        ]
+
+        if self.db_port is not None:
+            self.run_local_db(*commands)
+            return
+
+        # chain everything in one shell so it only costs a single exec
+        self.exec_k8s(
+            self.db_pod,
+            "postgres",
+            "env",
+            f"PGPASSWORD={self.db_configuration['password']}",
+            f"PGUSER={self.db_configuration['username']}",
+            "PGHOST=localhost",
+            "sh", "-c", " && ".join(shlex.join(command) for command in commands),
+            stdin=stdin,
             stdout=sys.stdout,
             stderr=sys.stderr,
         )
 
+    def recreate_db_from_dir(self, tar, dump_dir, members):
+        self.exec_k8s(self.db_pod, "postgres", "rm", "-rf", DUMP_DIR)
+        # stream the dump directory out of the archive straight into the pod
+        with self.open_exec(
+            self.db_pod,
+            "postgres",
+            "tar", "x", "-C", os.path.dirname(DUMP_DIR),
+            stdin=subprocess.PIPE,
+        ) as proc:
+            with tarfile.open(fileobj=proc.stdin, mode="w|", bufsize=COPY_BUFSIZE, copybufsize=COPY_BUFSIZE) as upload:
+                for member in members:
+                    member.name = os.path.normpath(os.path.join(
+                        os.path.basename(DUMP_DIR),
+                        os.path.relpath(member.name, dump_dir),
+                    ))
+                    upload.addfile(member, tar.extractfile(member))
+        # single transaction mode (-1) can't be combined with parallel jobs
+        self.recreate_db("-j", str(self.jobs), DUMP_DIR)
+        self.exec_k8s(self.db_pod, "postgres", "rm", "-rf", DUMP_DIR)
+
+    def recreate_db_local(self, tar, dump_path, members):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for member in members:
+                # the data filter keeps absolute or escaping names inside tmpdir
+                tar.extract(member, tmpdir, filter="data")
+            # from a local file even custom format dumps restore in parallel
+            self.recreate_db("-j", str(self.jobs), os.path.join(tmpdir, dump_path.lstrip("/")))
+
+    @staticmethod
+    def dump_dir(dump_dirs, member):
+        # dumps are always stored as <root>/backup.dump/<file> with the directory
+        # entry first, so its files are matched on their exact parent rather than
+        # anything that happens to end in .dump, like the backup name
+        if member.isdir() and os.path.basename(member.name) == os.path.basename(DUMP_DIR):
+            dump_dirs.add(member.name)
+            return member.name
+        parent = os.path.dirname(member.name)
+        return parent if parent in dump_dirs else None
+
     def recreate_secret(self, old_secret):
         old_operator_name = old_secret["metadata"].get("labels", {}).get("app.kubernetes.io/part-of", None)
         if old_operator_name:
             old_secret_name = old_secret["metadata"]["name"]
             new_secret_name = old_secret_name.removeprefix(old_operator_name)
             new_secret_name = f"{self.operator_name}{new_secret_name}"
-            current_secret = json.loads(self.run_k8s("get", "secret", new_secret_name, "-o", "json"))
-            current_secret["data"] = old_secret["data"]
-            self.run_k8s("apply", "-f", "-", stdin=json.dumps(current_secret).encode())
+            self.replace_secret_data(new_secret_name, old_secret["data"])
 
     def restore(self, name):
-        if not name.endswith(".tar"):
-            name = f"{name}.tar"
-        with tarfile.open(name) as tar:
-            for member in tar.getmembers():
-                if member.name.endswith(".dump"):
-                    with tar.extractfile(member) as dump:
-                        content = dump.read()
-                        self.recreate_db(content)
-                elif member.name.endswith("_secret.json"):
-                    with tar.extractfile(member) as dump:
-                        content = json.loads(dump.read())
-                        self.recreate_secret(content)
-                elif member.type != tarfile.DIRTYPE:
-                    print(f"Unknown backup file {member.name}", file=sys.stderr)
+        if not name.endswith((".tar", ".tar.zst")):
+            name = f"{name}.tar.zst" if os.path.exists(f"{name}.tar.zst") else f"{name}.tar"
+        with self.open_archive(name, "r") as tar, ThreadPoolExecutor(max_workers=SECRET_WORKERS) as executor:
+            secrets = []
+            for dump_dir, members in itertools.groupby(tar, key=functools.partial(self.dump_dir, set())):
+                if dump_dir:
+                    if self.db_port is None:
+                        self.recreate_db_from_dir(tar, dump_dir, members)
+                    else:
+                        self.recreate_db_local(tar, dump_dir, members)
+                    continue
+
+                for member in members:
+                    legacy_dump = member.isfile() and os.path.basename(member.name) == os.path.basename(DUMP_DIR)
+                    if legacy_dump and self.db_port is not None:
+                        self.recreate_db_local(tar, member.name, [member])
+                    elif legacy_dump:
+                        # archives from before directory format dumps
+                        with tar.extractfile(member) as dump:
+                            self.recreate_db("-1", stdin=dump)
+                    elif member.name.endswith("_secret.json"):
+                        with tar.extractfile(member) as dump:
+                            content = json.load(dump)
+                            secrets.append(executor.submit(self.recreate_secret, content))
+                    elif member.type != tarfile.DIRTYPE:
+                        print(f"Unknown backup file {member.name}", file=sys.stderr)
+
+            # surface any failure from the workers
+            for secret in secrets:
+                secret.result()
+
+def positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
 
 if __name__ == "__main__":
     default_name = datetime.now().strftime("%Y-%m-%d")
@@ -158,7 +541,7 @@ if __name__ == "__main__":
         "backup_name",
         nargs="?",
         default=default_name,
-        help=f"The name of the backup, will be used to construct the backup filename <backup_name>.tar. Defaults to {default_name}",
+        help=f"The name of the backup, will be used to construct the backup filename <backup_name>.tar (or <backup_name>.tar.zst). Defaults to {default_name}",
     )
     parser.add_argument(
         "-n",
@@ -166,11 +549,35 @@ if __name__ == "__main__":
         default="awx",
         help="The namespace that was used when creating AWX using awx-operator",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        help="The number of parallel jobs pg_dump and pg_restore use. Defaults to the number of CPUs in the postgres pod, "
+        "or on this machine with --local-db",
+    )
+    parser.add_argument(
+        "--zstd",
+        action="store_true",
+        help="Compress the backup archive with multithreaded zstd, requires the zstandard package",
+    )
+    parser.add_argument(
+        "--local-db",
+        action="store_true",
+        help="Run pg_dump and pg_restore on this machine through a kubectl port-forward instead of inside the postgres pod, "
+        "requires PostgreSQL client tools at least as new as the server",
+    )
     args = parser.parse_args()
+    if args.zstd and zstandard is None:
+        parser.error("--zstd requires the zstandard package")
+    if args.local_db:
+        missing = [tool for tool in ("pg_dump", "pg_restore", "dropdb", "createdb") if shutil.which(tool) is None]
+        if missing:
+            parser.error(f"--local-db requires the PostgreSQL client tools, missing {', '.join(missing)}")
 
-    deployment = Deployment(args.namespace)
+    deployment = Deployment(args.namespace, jobs=args.jobs, local_db=args.local_db)
     if args.command == "backup":
-        deployment.backup(args.backup_name)
+        deployment.backup(args.backup_name, zstd=args.zstd)
     elif args.command == "restore":
         deployment.restore(args.backup_name)
 